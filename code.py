@@ -10,41 +10,196 @@
 # - https://docs.circuitpython.org/projects/vcnl4040/en/latest/api.html
 # - https://www.vishay.com/docs/84274/vcnl4040.pdf
 #
+import asyncio
 from board import NEOPIXEL, NEOPIXEL_POWER, STEMMA_I2C
-from digitalio import DigitalInOut, Direction
+from digitalio import DigitalInOut, Direction, Pull
 import gc
+from micropython import const
 from neopixel_write import neopixel_write
+from supervisor import ticks_ms
 from sys import stdout
-from time import sleep
 
+from adafruit_ticks import ticks_add, ticks_diff
+
+from adafruit_register.i2c_bit import RWBit
 from adafruit_seesaw import digitalio
 from adafruit_seesaw.seesaw import Seesaw
 from adafruit_vcnl4040 import VCNL4040
 
 
+# Seesaw pin number for the encoder knob's click button
+_BTN = const(24)
+
+# Proximity threshold range limits (see comments in setThresh)
+_LO = const(2)
+_HI = const(60)
+
+# Neopixel colors (GRB byte order). These get allocated once here so
+# updateNeopixel() doesn't need to make a new bytearray on every call.
+_LED_ON = bytearray(b'\x05\x00\x05')   # cyan
+_LED_OFF = bytearray(b'\x00\x00\x00')  # off
+
+# Optional encoder interrupt pin. The Seesaw rotary encoder breakout has
+# an INT output that goes low when the knob is turned or clicked. If you
+# run a jumper wire from INT to a GPIO pin on your board, set this to
+# that pin (e.g. `from board import A3` and `ENC_INT = A3`). Then,
+# encoderTask() can skip the encoder I2C reads when nothing has changed.
+# With the default of None, it just polls the encoder every time.
+ENC_INT = None
+
+# Optional proximity sensor interrupt pin. The VCNL4040 breakout has an
+# INT output too. It can be set up to go low when proximity is at or
+# above the threshold, and to go back high when it drops below. If you
+# wire INT to a GPIO pin, set this to that pin (like ENC_INT above).
+# Then, ledTask() can update the Neopixel from the INT pin's value
+# without reading the sensor over I2C. With the default of None, it
+# reads the sensor over I2C every time.
+PROX_INT = None
+
+# Garbage collection. A gc pass can take long enough to make the knob
+# feel laggy, so automatic gc is disabled. Instead, uiTask() collects
+# when the mode changes, which is a moment when a pause won't be noticed.
+# Tick pacing and drawing don't allocate, so the only garbage comes from
+# the small buffers the sensor libraries use for I2C reads. That means
+# the GC_LOW_MEM check in uiTask() is just a backstop that should almost
+# never fire.
+gc.disable()
+GC_LOW_MEM = 8192   # bytes
+
+
 class Encoder():
     # Wrapper for Seesaw I2C rotary encoder (Adafruit #5880 or #4991)
-    def __init__(self, i2c, address):
+    def __init__(self, i2c, address, int_pin=None):
         # Initialize encoder and verify Seesaw firmware version
+        # - int_pin is an optional board pin wired to the Seesaw INT
         ssw = Seesaw(i2c, addr=0x36)
         ver = (ssw.get_version() >> 16) & 0xffff
         assert (ver == 4991), 'unexpected seesaw firmware version'
         # Enable pullup for knob-click button
-        ssw.pin_mode(24, Seesaw.INPUT_PULLUP)
+        ssw.pin_mode(_BTN, Seesaw.INPUT_PULLUP)
         self.ssw = ssw
+        self.clicked = False
+        self.delta = 0
+        self.int_pin = None
+        if int_pin is not None:
+            # Make Seesaw pull INT low for knob turns and button changes
+            ssw.set_GPIO_interrupts(1 << _BTN, True)
+            ssw.enable_encoder_interrupt()
+            # INT is open drain, so it needs a pullup
+            self.int_pin = DigitalInOut(int_pin)
+            self.int_pin.switch_to_input(pull=Pull.UP)
+
+    def pending(self):
+        # Return true when the encoder may have new click or delta input.
+        # Without an interrupt pin, there's no way to know, so always
+        # return True so encoderTask() will poll over I2C.
+        if self.int_pin is None:
+            return True
+        return not self.int_pin.value
+
+    def snapshot(self):
+        # Read knob button and turn state once per pass through an event
+        # loop. Afterwards, the results are available as the `clicked`
+        # (true when button is pressed) and `delta` (amount knob was
+        # turned) attributes. If the encoder has nothing pending, skip
+        # the I2C reads and keep the previous button state.
+        if not self.pending():
+            self.delta = 0
+            return
+        ssw = self.ssw
+        if self.int_pin is None:
+            self.clicked = not ssw.digital_read(_BTN)
+        else:
+            # Reading the GPIO interrupt flags releases the INT line and
+            # says whether the button changed. Each Seesaw read takes
+            # about 8 ms, so only read the button when its flag is set.
+            flags = ssw.get_GPIO_interrupt_flag()
+            if flags & (1 << _BTN):
+                self.clicked = not ssw.digital_read(_BTN)
+        # Always read the delta, since that also clears the encoder's
+        # interrupt
+        self.delta = ssw.encoder_delta()
+
+
+class Context():
+    # Shared data used by several functions.
+    #
+    # This started out as a dictionary, which makes it easy to try
+    # ideas quickly without typing lots of boilerplate code. As the
+    # amount of shared state grew, named attributes made it easier to
+    # keep track of. The __slots__ list catches typos in attribute
+    # names on CPython (and documents them for CircuitPython, which
+    # ignores __slots__).
+    __slots__ = (
+        'menuNames', 'menuActions', 'lastItem', 'lines', 'enc', 'vcnl',
+        'np', 'newline', 'selection', 'threshold', 'mode', 'click',
+        'delta', 'prox', 'prevSel', 'ticks', 'prevVal', 'line',
+    )
+
+    def __init__(self, menuNames, menuActions, enc, vcnl, np):
+        self.menuNames = menuNames      # Navigation menu item names
+        self.menuActions = menuActions  # Navigation menu item actions
+        self.lastItem = len(menuActions) - 1  # Highest menu index
+        self.lines = None         # Pre-rendered menu lines for showMenu()
+        self.enc = enc            # Encoder object for submenus to use
+        self.vcnl = vcnl          # VCNL4040 object for submenus to use
+        self.np = np              # Neopixel pin (DigitalInOut)
+        self.newline = True       # Should menu start on a new line?
+        self.selection = 0        # Menu selection index
+        self.threshold = 4        # Proximity threshold (range 2..60)
+        self.mode = 'menu'        # Key for MODES table of tick functions
+        self.click = False        # Was knob clicked since last UI tick?
+        self.delta = 0            # Knob turn amount since last UI tick
+        self.prox = None          # Last proximity reading by ledTask()
+        self.prevSel = None       # Last selection drawn by menuTick()
+        self.ticks = 0            # Ticks since the current mode last drew
+        self.prevVal = None       # Last value drawn by other tick functions
+        self.line = None          # Line buffer for showValue()
+
+
+class ProxSensor(VCNL4040):
+    # Wrapper for VCNL4040 proximity sensor with optional INT pin
+    # PS_MS bit: False = normal interrupt mode, True = logic output mode
+    # (see the PS_MS register description in the VCNL4040 datasheet)
+    proximity_logic_mode = RWBit(0x04, 14, register_width=2)
+
+    def __init__(self, i2c, int_pin=None):
+        # Initialize sensor
+        # - int_pin is an optional board pin wired to the VCNL4040 INT
+        super().__init__(i2c)
+        self.int_pin = None
+        if int_pin is not None:
+            # In logic output mode, the sensor holds INT low while the
+            # proximity reading is above the high threshold, and lets
+            # it go back high once the reading drops below the low
+            # threshold. So, INT follows the threshold comparison
+            # without any need to read and clear interrupt flags.
+            self.proximity_interrupt = VCNL4040.PS_INT_CLOSE_AWAY
+            self.proximity_logic_mode = True
+            # INT is open drain, so it needs a pullup
+            self.int_pin = DigitalInOut(int_pin)
+            self.int_pin.switch_to_input(pull=Pull.UP)
 
-    def clicked(self):
-        # Return true when encoder knob button is pressed
-        return not self.ssw.digital_read(24)
+    def setThreshold(self, thresh):
+        # Program the INT pin thresholds to match the Neopixel threshold.
+        # INT goes low once proximity is more than thresh - 1, which is
+        # the same as proximity >= thresh. It goes back high when the
+        # reading drops below thresh. So, INT matches the polled
+        # comparison in ledTask(), with no hysteresis.
+        if self.int_pin is not None:
+            self.proximity_high_threshold = thresh - 1
+            self.proximity_low_threshold = thresh
 
-    def delta(self):
-        # Return delta representing amount knob was turned
-        return self.ssw.encoder_delta()
+    def near(self):
+        # Return true when proximity is at or above the threshold from
+        # setThreshold(). This is a GPIO read of the INT pin, so it only
+        # works when int_pin was given.
+        return not self.int_pin.value
 
 
-def showMenu(prefix, ctx):
+def showMenu(ctx):
     # Show the menu with selected item highlighted.
-    # - ctx is the context dictionary
+    # - ctx is the Context object
     #
     # Menu selection highlighting uses the ANSI escape code for
     # inverse video. To read more about that, see:
@@ -55,77 +210,159 @@ def showMenu(prefix, ctx):
     # to return the cursor to the left margin of the last line of
     # console output. But, there is also a check (newline) to avoid
     # stomping on the last line of console output from doAction().
-    newline = ctx['newline']
-    sel = ctx['selection']
-    menu = ctx['menu']
+    #
+    # The menu lines get pre-rendered by main(), one for each possible
+    # selection, so this can run at 30 Hz without allocating new
+    # strings or making lots of small writes every time.
+    newline = ctx.newline
+    sel = ctx.selection
     wr = stdout.write
     if newline:
         # Avoid stomping on console output from doAction()
-        ctx['newline'] = False
+        ctx.newline = False
         wr("\n")
-    wr('\r%s: ' % prefix)     # CR moves cursor to left margin
-    for (i, (name, _)) in enumerate(menu):
-        if i == sel:
-            wr(b'\x1b[7m')    # ANSI escape code for inverse text
-            wr(' %s ' % name)
-            wr(b'\x1b[0m')    # ANSI escape code for normal text
-        else:
-            wr(' %s ' % name)
+    wr(ctx.lines[sel])     # starts with CR to move cursor to margin
+
+def showValue(line, val):
+    # Show an integer value on the same line as the last one.
+    # - line is a bytearray from newLine() with the value's label
+    # - val is a non-negative integer
+    #
+    # This formats val into the last 8 bytes of line like '% 6d  '
+    # does, but it modifies line in place rather than allocating a new
+    # string each time. Like '% 6d', there is always at least one
+    # leading space, so values bigger than 5 digits get clamped.
+    i = len(line) - 2        # leave the two trailing spaces alone
+    end = i - 6
+    val = min(val, 99999)
+    while True:
+        i -= 1
+        line[i] = 48 + (val % 10)   # 48 is ASCII '0'
+        val //= 10
+        if val == 0:
+            break
+    while i > end:
+        i -= 1
+        line[i] = 32                # 32 is ASCII ' '
+    stdout.write(line)
+
+def newLine(label):
+    # Make a line buffer for showValue() with the given label (bytes).
+    # The CR at the start moves the cursor to the left margin.
+    return bytearray(b'\r ' + label + b': ' + (b' ' * 8))
 
 def doAction(ctx):
     # Perform the action for the selected menu item
     print()  # showMenu ends without a '\n', so add one now
-    selection = ctx['selection']
-    (name, action) = ctx['menu'][selection]
+    selection = ctx.selection
+    action = ctx.menuActions[selection]
     if not callable(action):
-        # If this happens, check your context dictionary
-        print(name, 'menu action is not callable')
+        # If this happens, check your menu lists in main()
+        print(ctx.menuNames[selection], 'menu action is not callable')
+        # Don't let showMenu stomp on the error message
+        ctx.newline = True
     else:
-        # Do action for selected menu
+        # Do action for selected menu. The action prints its heading
+        # then switches ctx.mode so uiTask() will start calling
+        # the tick function for the new mode.
         action(ctx)
+
+def endAction(ctx):
+    # Finish a menu action and go back to the main menu
+    stdout.write('\n')
     # Tell showMenu to add a newline so it doesn't stomp on the
-    # last line of output printed by action(context) above
-    ctx['newline'] = True
+    # last line of output printed by the action's tick function
+    ctx.newline = True
+    return 'menu'
+
+def menuTick(ctx):
+    # Main menu tick function (returns next mode)
+    # Handle knob click
+    if ctx.click:
+        doAction(ctx)
+        return ctx.mode
+    # Handle knob turn by updating menu selection by an increment of
+    # `delta` items. Selection must be a valid index of the menu:
+    # 1. max(0, ...) ensures 0 <= selection
+    # 2. min(ctx.lastItem, ...) ensures selection < number of items
+    # This is inlined, rather than being a separate function, to save
+    # the overhead of a function call.
+    #
+    # Since encoderTask() adds up all the knob turns since the last
+    # tick, a fast spin through several menu items only causes one
+    # menu update here.
+    sel = ctx.selection
+    delta = ctx.delta
+    if delta != 0:
+        sel = max(0, min(ctx.lastItem, sel + delta))
+        ctx.selection = sel
+    # Update the menu when the selection changes, after an action
+    # finishes (newline is set), or about once per second even if
+    # nothing changed. The periodic update makes it so, if you
+    # connect to the USB serial port after code.py has been running
+    # for a while, the menu shows up quickly.
+    ctx.ticks += 1
+    if sel != ctx.prevSel or ctx.newline or ctx.ticks >= 30:
+        showMenu(ctx)
+        ctx.prevSel = sel
+        ctx.ticks = 0
+    return 'menu'
 
 def showProx(ctx):
     # Show current proximity sensor reading (click to stop)
     print("VCNL4040 Proximity (click to go back):")
-    enc = ctx['enc']
-    vcnl = ctx['vcnl']
-    wr = stdout.write
-    prevClick = False
-    while True:
-        sleep(0.1)  # poll at 10 Hz to reduce annoying flicker
-        # Print current proximity measurement on same line as last one
-        wr('\r proximity: % 6d  ' % vcnl.proximity)
-        # End loop on edge trigger of knob pressed -> released
-        click = enc.clicked()
-        if (not click) and (click != prevClick):
-            wr('\n')
-            return
-        prevClick = click
-        # Update LED
-        updateNeopixel(ctx)
+    ctx.line = newLine(b'proximity')
+    ctx.prevVal = None
+    ctx.ticks = 3          # read sensor on first tick
+    ctx.mode = 'prox'
+
+def proxTick(ctx):
+    # Proximity mode tick function (returns next mode)
+    if ctx.click:
+        return endAction(ctx)
+    # Only read the sensor every 3rd tick (10 Hz) to reduce annoying
+    # flicker. Checking for clicks every tick keeps the knob responsive.
+    ctx.ticks += 1
+    if ctx.ticks < 3:
+        return 'prox'
+    ctx.ticks = 0
+    # Print current proximity measurement on same line as last one,
+    # but only if it changed. Without a proximity INT pin, ledTask()
+    # reads the sensor every tick, so reuse its reading from ctx.prox
+    # rather than asking the sensor again over I2C.
+    val = ctx.prox
+    if val is None:
+        val = ctx.vcnl.proximity
+    if val != ctx.prevVal:
+        showValue(ctx.line, val)
+        ctx.prevVal = val
+    return 'prox'
 
 def showLux(ctx):
     # Show current ambient illumination reading (click to stop)
     print("VCNL4040 Ambient Lux (click to go back):")
-    enc = ctx['enc']
-    vcnl = ctx['vcnl']
-    wr = stdout.write
-    prevClick = False
-    while True:
-        sleep(0.1)  # poll at 10 Hz to reduce annoying flicker
-        # Print current lux measurement on same line as last one
-        wr('\r lux: % 6d  ' % vcnl.lux)
-        # End loop on edge trigger of knob pressed -> released
-        click = enc.clicked()
-        if (not click) and (click != prevClick):
-            wr('\n')
-            return
-        prevClick = click
-        # Update LED
-        updateNeopixel(ctx)
+    ctx.line = newLine(b'lux')
+    ctx.prevVal = None
+    ctx.ticks = 3          # read sensor on first tick
+    ctx.mode = 'lux'
+
+def luxTick(ctx):
+    # Lux mode tick function (returns next mode)
+    if ctx.click:
+        return endAction(ctx)
+    # Only read the sensor every 3rd tick (10 Hz) to reduce annoying
+    # flicker. Checking for clicks every tick keeps the knob responsive.
+    ctx.ticks += 1
+    if ctx.ticks < 3:
+        return 'lux'
+    ctx.ticks = 0
+    # Print current lux measurement on same line as last one, but
+    # only if it changed
+    val = int(ctx.vcnl.lux)   # lux is a float
+    if val != ctx.prevVal:
+        showValue(ctx.line, val)
+        ctx.prevVal = val
+    return 'lux'
 
 def setThresh(ctx):
     # Set proximity threshold for changing Neopixel color
@@ -144,55 +381,184 @@ def setThresh(ctx):
     #           8    80..85
     #          60    10
     print("Proximity threshold, range 2..60 (click to save):")
-    enc = ctx['enc']
-    LO = 2
-    HI = 60
-    wr = stdout.write
+    ctx.line = newLine(b'threshold')
+    ctx.prevVal = None
+    ctx.mode = 'thresh'
+
+def threshTick(ctx):
+    # Threshold mode tick function (returns next mode)
+    if ctx.click:
+        return endAction(ctx)
+    # Handle knob turn
+    thresh = ctx.threshold
+    delta = ctx.delta
+    if delta != 0:
+        thresh = max(_LO, min(_HI, thresh + delta))
+        ctx.threshold = thresh         # update context!
+        ctx.vcnl.setThreshold(thresh)  # update INT pin thresholds
+    # Print current threshold on same line as last one, but only if
+    # it changed
+    if thresh != ctx.prevVal:
+        showValue(ctx.line, thresh)
+        ctx.prevVal = thresh
+    return 'thresh'
+
+# Mode table for uiTask(): mode name -> (tick function, period).
+# Tick periods are in ms. All modes tick at 30 Hz so the knob feels
+# responsive. The sensor reading modes rate limit their own display
+# updates to 10 Hz.
+MODES = {
+    'menu':   (menuTick,   33),
+    'prox':   (proxTick,   33),
+    'lux':    (luxTick,    33),
+    'thresh': (threshTick, 33),
+}
+
+# TICK PACING
+#
+# Each of the tasks below runs a fixed rate loop. Rather than sleeping
+# for a fixed amount of time, the loops wait for an absolute deadline.
+# That way, time spent on I2C and USB serial output in the loop body
+# doesn't make the tick rate drift. The deadline step looks like this:
+#
+#     deadline = ticks_add(deadline, period)
+#     wait = ticks_diff(deadline, ticks_ms())
+#     if wait < 0:
+#         deadline = ticks_ms()
+#     await asyncio.sleep_ms(wait)
+#
+# When a loop is running behind (wait < 0), it skips ahead rather than
+# trying to catch up with a burst of ticks. sleep_ms() treats negative
+# waits as 0, which still lets the other tasks run. The step is inlined
+# in each task, rather than being an async helper function, because
+# awaiting a helper coroutine would allocate a new coroutine object on
+# every tick. sleep_ms() reuses one shared generator, so pacing the
+# loops this way doesn't allocate anything.
+
+async def encoderTask(ctx):
+    # Poll the rotary encoder and publish input events to the context.
+    # Clicks and knob turns accumulate in ctx.click and ctx.delta
+    # until uiTask() consumes them. That way, no input gets lost when
+    # the current mode has a slow tick period.
+    # Bind the method and functions used in the loop to local names
+    # once, to save attribute and global lookups on every pass.
+    enc = ctx.enc
+    snapshot = enc.snapshot
+    sleep_ms = asyncio.sleep_ms
     prevClick = False
-    thresh = ctx['threshold']
+    deadline = ticks_ms()
     while True:
-        sleep(0.03)  # poll at 30 Hz so knob feels responsive
-        # Print current threshold on same line as last one
-        wr('\r threshold: % 6d  ' % thresh)
-        click = enc.clicked()
-        delta = enc.delta()
-        # Handle knob click (edge trigger on pressed -> released)
+        # Poll at 30 Hz so knob feels responsive (see TICK PACING)
+        deadline = ticks_add(deadline, 33)
+        wait = ticks_diff(deadline, ticks_ms())
+        if wait < 0:
+            deadline = ticks_ms()
+        await sleep_ms(wait)
+        # Read the rotary encoder (Seesaw I2C)
+        snapshot()
+        click = enc.clicked
+        # Knob click is edge triggered on pressed -> released
         if (not click) and (click != prevClick):
-            wr('\n')
-            return
+            ctx.click = True
+        ctx.delta += enc.delta
         prevClick = click
-        # Handle knob turn
-        if delta != 0:
-            thresh = max(LO, min(HI, thresh + delta))
-            ctx['threshold'] = thresh         # update context!
-        # Update LED
-        updateNeopixel(ctx)
-
-def updateNeopixel(ctx):
-    # Set neopixel according to thresholds and proximity sensor
-    np = ctx['np']
-    if ctx['vcnl'].proximity >= ctx['threshold']:
-        neopixel_write(np, bytearray([5, 0, 5]))   # LED = cyan
-    else:
-        neopixel_write(np, bytearray([0, 0, 0]))   # LED = off
 
-def select(delta, ctx):
-    # Update menu selection by an increment of `delta` items.
-    # Selection must be a valid index of context['menu'] array:
-    # 1. max(0, ...) ensures 0 <= selection
-    # 2. min(limit, ...) ensures selection < len(context['menu'])
-    sel = ctx['selection']
-    limit = len(ctx['menu']) - 1
-    ctx['selection'] = max(0, min(limit, (sel + delta)))
+async def uiTask(ctx):
+    # Call the tick function for the current mode from the MODES table.
+    # Tick functions return the name of the next mode.
+    #
+    # Bind the globals and module functions used in the loop to local
+    # names once, to save global and attribute lookups on every pass.
+    modes = MODES
+    sleep_ms = asyncio.sleep_ms
+    memFree = gc.mem_free
+    collect = gc.collect
+    lowMem = GC_LOW_MEM
+    deadline = ticks_ms()
+    while True:
+        prev = ctx.mode
+        (tick, period) = modes[prev]
+        # Wait for next tick (see TICK PACING)
+        deadline = ticks_add(deadline, period)
+        wait = ticks_diff(deadline, ticks_ms())
+        if wait < 0:
+            deadline = ticks_ms()
+        await sleep_ms(wait)
+        # Run tick function for current mode, then mark the input
+        # events from encoderTask() as consumed. Compare against prev,
+        # not ctx.mode, because menu actions set ctx.mode themselves
+        # during the tick.
+        mode = tick(ctx)
+        ctx.click = False
+        ctx.delta = 0
+        # Automatic gc is disabled, so collect garbage here when the
+        # mode changes (a pause right after a click won't be noticed).
+        # The low memory check is a backstop that should almost never
+        # fire (see Garbage collection at the top).
+        if mode != prev or memFree() < lowMem:
+            collect()
+        ctx.mode = mode
+
+async def ledTask(ctx):
+    # Keep the Neopixel in sync with the proximity sensor
+    # Bind the functions used in the loop to local names once, to save
+    # global lookups on every pass.
+    np = ctx.np
+    vcnl = ctx.vcnl
+    polled = vcnl.int_pin is None
+    update = updateNeopixel
+    sleep_ms = asyncio.sleep_ms
+    color = None
+    deadline = ticks_ms()
+    while True:
+        # Update at 30 Hz (see TICK PACING)
+        deadline = ticks_add(deadline, 33)
+        wait = ticks_diff(deadline, ticks_ms())
+        if wait < 0:
+            deadline = ticks_ms()
+        await sleep_ms(wait)
+        if polled:
+            # Share the I2C reading with proxTick() through ctx.prox
+            prox = vcnl.proximity
+            ctx.prox = prox
+            near = prox >= ctx.threshold
+        else:
+            # Proximity INT pin does the comparison (GPIO read)
+            near = vcnl.near()
+        color = update(np, near, color)
+
+async def runTasks(ctx):
+    # Run the encoder, UI, and LED tasks concurrently
+    await asyncio.gather(
+        asyncio.create_task(encoderTask(ctx)),
+        asyncio.create_task(uiTask(ctx)),
+        asyncio.create_task(ledTask(ctx)),
+    )
+
+def updateNeopixel(np, near, prevColor):
+    # Set neopixel according to proximity threshold comparison
+    # - np is the Neopixel pin (DigitalInOut)
+    # - near is true when proximity is at or above the threshold
+    # - prevColor is the return value from the last call (or None)
+    # Returns the current LED color.
+    #
+    # Writing to the Neopixel briefly disables interrupts, so this
+    # only writes when the color needs to change.
+    if near:
+        color = _LED_ON     # LED = cyan
+    else:
+        color = _LED_OFF    # LED = off
+    if color is not prevColor:
+        neopixel_write(np, color)
+    return color
 
 def main():
-    # Initialize hardware then start the event loop
-    gc.collect()
+    # Initialize hardware then start the asyncio tasks
     i2c = STEMMA_I2C()
     # Rotary Encoder
-    enc = Encoder(i2c, 0x35)
+    enc = Encoder(i2c, 0x35, int_pin=ENC_INT)
     # Proximity and Lux sensor
-    vcnl = VCNL4040(i2c)
+    vcnl = ProxSensor(i2c, int_pin=PROX_INT)
     # Neopixel
     np = DigitalInOut(NEOPIXEL)
     pwr = DigitalInOut(NEOPIXEL_POWER)
@@ -200,57 +566,51 @@ def main():
     pwr.direction = Direction.OUTPUT
     pwr.value = True
 
-    # CONTEXT DICTIONARY AND NAV MENU
+    # CONTEXT OBJECT AND NAV MENU
     #
-    # The context dictionary holds shared data used by several
-    # functions. You could use a class or individual variables for
-    # this. But, for simple prototyping, a dictionary makes it easy
-    # to try ideas quickly without typing lots of boilerplate code.
-    # You can read about declaring dictionary literals at:
-    #   https://docs.python.org/3/library/stdtypes.html#dict
+    # The context object holds shared data used by several functions.
+    # See the Context class for the list of what's in it.
     #
-    # For the menu item list, each entry should be a tuple of
-    # (name, callable object). The name gets used by the function
-    # that prints the current menu selection. The callable object
-    # gets used when you pick a menu item. In Python, functions and
-    # methods are callable objects. You can call them with a `()`
-    # after their name, or you can assign them to variables by
-    # omitting the `()`.
+    # The menu is two parallel tuples: item names and item actions.
+    # The names get used to pre-render the menu lines that show the
+    # current menu selection. The actions, which should be callable
+    # objects, get used when you pick a menu item. In Python,
+    # functions and methods are callable objects. You can call them
+    # with a `()` after their name, or you can assign them to
+    # variables by omitting the `()`. Keeping names and actions
+    # separate means the code that uses each one doesn't need to
+    # unpack (name, action) tuples.
     #
-    ctx = {
-        'menu': [             # Navigation menu
-            ('Show Proxmity', showProx),
-            ('Show Lux',      showLux),
-            ('Set Threshold', setThresh),
-        ],
-        'enc': enc,           # Encoder object for submenus to use
-        'vcnl': vcnl,         # VCNL4040 object for submenus to use
-        'np': np,             # Neopixel pin (DigitalInOut)
-        'newline': True,      # Should menu start on a new line?
-        'selection': 0,       # Menu selection index
-        'threshold': 4,       # Proximity threshold (range 2..60)
-    }
-
-    # EVENT LOOP
-    prevClick = False
-    while True:
-        sleep(0.03)  # poll at 30 Hz so knob feels responsive
-        # Update the menu every time through the loop, even if the
-        # rotary encoder state has not changed. This makes it so,
-        # if you connect to the USB serial port after code.py has
-        # been running for a while, the menu shows up immediately.
-        showMenu('Main', ctx)
-        # Read the rotary encoder (Seesaw I2C)
-        click = enc.clicked()
-        delta = enc.delta()
-        # Handle knob click (edge trigger on pressed -> released)
-        if (not click) and (click != prevClick):
-            doAction(ctx)
-        prevClick = click
-        # Handle knob turn
-        if delta != 0:
-            select(delta, ctx)
-        # Update LED
-        updateNeopixel(ctx)
+    menuNames = ('Show Proxmity', 'Show Lux', 'Set Threshold')
+    menuActions = (showProx, showLux, setThresh)
+    ctx = Context(menuNames, menuActions, enc, vcnl, np)
+    vcnl.setThreshold(ctx.threshold)
+
+    # PRE-RENDERED MENU STRINGS
+    #
+    # Formatting the menu strings once here, rather than in every
+    # call to showMenu(), avoids making garbage for gc to clean up.
+    # The '\x1b[7m' and '\x1b[0m' are ANSI escape codes for inverse
+    # and normal text.
+    #
+    # There is one complete menu line for each possible selection, so
+    # showMenu() can send the whole line with a single write.
+    prefix = b'\rMain: '   # CR moves cursor to left margin
+    rendered = [
+        (b' ' + name.encode() + b' ',
+         b'\x1b[7m ' + name.encode() + b' \x1b[0m')
+        for name in ctx.menuNames
+    ]
+    ctx.lines = [
+        prefix + b''.join(hilite if i == sel else plain
+                          for (i, (plain, hilite)) in enumerate(rendered))
+        for sel in range(len(rendered))
+    ]
+
+    # Clean up garbage from initialization before starting the tasks
+    gc.collect()
+
+    # Start the asyncio tasks (this never returns)
+    asyncio.run(runTasks(ctx))
 
 main()